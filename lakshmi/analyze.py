@@ -484,7 +484,7 @@ class Allocate:
     lakshmi.Portfolio.reset.what_ifs).
     """
 
-    def __init__(self, account_name, exclude_assets=[], rebalance=False):
+    def __init__(self, account_name, exclude_assets=(), rebalance=False):
         """
         Args:
             account_name: The full name of the account to analyze.
@@ -508,9 +508,11 @@ class Allocate:
                 return True
         return False
 
-    def _apply_whatifs(self, portfolio, assets, deltas, saved_whatifs={},
-                       zero_ratio_assets=[]):
+    def _apply_whatifs(self, portfolio, assets, deltas, saved_whatifs=None,
+                       zero_ratio_assets=()):
         """Apply whatifs given by deltas to assets in the portfolio."""
+        if saved_whatifs is None:
+            saved_whatifs = {}
         table = Table(2, ['Asset', 'Delta'], ['str', 'delta_dollars'])
         for asset, delta in zip(assets, deltas):
             portfolio.what_if(self.account_name,
@@ -551,8 +553,9 @@ class Allocate:
         cash = account.available_cash()
         assert cash != 0 or self.rebalance, (
             f'No available cash to allocate in {self.account_name}.')
+        exclude_assets = set(self.exclude_assets)
         assets = [x for x in account.assets() if x.short_name() not in
-                  self.exclude_assets]
+                  exclude_assets]
         assert len(assets) != 0, 'No assets to allocate cash to.'
 
         saved_whatifs = {}
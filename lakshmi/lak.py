@@ -38,7 +38,8 @@ class LakContext:
         # Explicitly specified file should exist.
         assert lakrcfile.exists(), f'Config file not found: {lakrc}'
 
-        config = yaml.load(lakrcfile.read_text(), Loader=yaml.SafeLoader)
+        with lakrcfile.open() as f:
+            config = yaml.load(f, Loader=lakshmi.utils.SafeLoader)
         return config
 
     def __init__(self, lakrc):
@@ -633,7 +634,8 @@ def edit_and_parse(edit_dict, parse_fn, filename):
     if edit_dict:
         help_msg = _HELP_MSG_PREFIX + '# ' + filepath.read_text().replace(
             '\n', '\n# ')
-        edit_str = yaml.dump(edit_dict, sort_keys=False) + help_msg
+        edit_str = yaml.dump(edit_dict, Dumper=lakshmi.utils.SafeDumper,
+                             sort_keys=False) + help_msg
     else:
         edit_str = filepath.read_text()
 
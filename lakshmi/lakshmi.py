@@ -1,6 +1,11 @@
 """Top level interfaces and definitions for Lakshmi."""
 
-import yaml
+import math
+import operator
+from collections import Counter
+from itertools import repeat
+
+import numpy as np
 
 import lakshmi.utils as utils
 from lakshmi.assets import from_dict, to_dict
@@ -27,7 +32,7 @@ class Account:
         d = {'Name': self._name,
              'Account Type': self.account_type}
         if self._assets:
-            d['Assets'] = [to_dict(asset) for asset in self.assets()]
+            d['Assets'] = [to_dict(asset) for asset in self._assets.values()]
         if self._cash != 0:
             d['Available Cash'] = self._cash
         return d
@@ -45,8 +50,8 @@ class Account:
         Raises: AssertionError if d cannot be parsed correctly.
         """
         ret_obj = cls(d.pop('Name'), d.pop('Account Type'))
-        for asset_dict in d.pop('Assets', []):
-            ret_obj.add_asset(from_dict(asset_dict))
+        ret_obj.set_assets(
+            [from_dict(asset_dict) for asset_dict in d.pop('Assets', [])])
         ret_obj._cash = d.pop('Available Cash', 0)
         assert len(d) == 0, 'Extra attributes found: ' + str(list(d.keys()))
         return ret_obj
@@ -62,18 +67,20 @@ class Account:
             Total value of this account (float).
         """
         if not include_whatifs:
-            return sum([asset.value() for asset in self.assets()])
+            return sum(asset.value() for asset in self.assets())
         else:
-            return self.available_cash() + sum(
-                [asset.adjusted_value() for asset in self.assets()])
+            return self.available_cash() + self._assets_total()
+
+    def _assets_total(self):
+        """Returns the total adjusted value of assets in this account."""
+        return sum(asset.adjusted_value() for asset in self.assets())
 
     def string(self):
         """Returns a string representation of this object."""
         table = Table(2)
         table.add_row(['Name:', self._name])
         table.add_row(['Type:', self.account_type])
-        table.add_row(['Total:', utils.format_money(
-            self.total() - self.available_cash())])
+        table.add_row(['Total:', utils.format_money(self._assets_total())])
         if self._cash:
             table.add_row(['Available Cash:',
                            utils.format_money_delta(self._cash)])
@@ -108,10 +115,16 @@ class Account:
 
         Args:
             assets: A list of lakshmi.assets.Asset
+
+        Raises: AssertionError if two assets have the same short_name.
         """
-        self._assets = {}
+        new_assets = {}
         for asset in assets:
-            self.add_asset(asset)
+            short_name = asset.short_name()
+            assert short_name not in new_assets, (
+                f'Attempting to add duplicate Asset: {short_name}')
+            new_assets[short_name] = asset
+        self._assets = new_assets
 
     def get_asset(self, short_name):
         """Returns an asset specified by short_name."""
@@ -152,20 +165,29 @@ class AssetClass:
     def __init__(self, name):
         """Returns a new AssetClass object named name."""
         self.name = name
-        self._children = []
+        # Child asset classes and their ratios, stored as parallel lists.
+        self._child_nodes = []
+        self._child_ratios = []
         # Populated when _validate is called.
         self._leaves = None
+        # Map of asset class name -> (asset class, ratio relative to this
+        # asset class) for this subtree. Populated when _validate is called.
+        self._name_index = None
+        # Memoized return value of _validate along with the return values of
+        # _validate for the children that it was computed from.
+        self._validate_cache = None
 
     def children(self):
-        """Returns a list of all the children of this asset class."""
-        return self._children
+        """Returns a list of (asset class, ratio) for all the children of
+        this asset class."""
+        return list(zip(self._child_nodes, self._child_ratios))
 
     def to_dict(self):
         """Returns a dict representing this object."""
         d = {'Name': self.name}
-        if self._children:
+        if self._child_nodes:
             d['Children'] = []
-            for child, ratio in self._children:
+            for child, ratio in zip(self._child_nodes, self._child_ratios):
                 val = {'Ratio': ratio}
                 val.update(child.to_dict())
                 d['Children'].append(val)
@@ -193,10 +215,23 @@ class AssetClass:
 
     def copy(self):
         """Returns a copy of this AssetClass and its sub-classes."""
-        ret_val = AssetClass(self.name)
-        for child, ratio in self._children:
-            ret_val.add_subclass(ratio, child.copy())
-        return ret_val
+        # Collect all the asset classes in the tree (parents before children)
+        # and copy them bottom-up, without recursion.
+        asset_classes = []
+        stack = [self]
+        while stack:
+            asset_class = stack.pop()
+            asset_classes.append(asset_class)
+            stack.extend(asset_class._child_nodes)
+
+        copies = {}
+        for asset_class in reversed(asset_classes):
+            ret_val = AssetClass(asset_class.name)
+            for child, ratio in zip(asset_class._child_nodes,
+                                    asset_class._child_ratios):
+                ret_val.add_subclass(ratio, copies[child])
+            copies[asset_class] = ret_val
+        return copies[self]
 
     def add_subclass(self, ratio, asset_class):
         """Add a subclass (asset class) to this asset class.
@@ -205,14 +240,20 @@ class AssetClass:
             ratio: The ratio of this asset class.
             asset_class: An AssetClass object representing the child class.
         """
-        self._children.append((asset_class, ratio))
+        self._child_nodes.append(asset_class)
+        self._child_ratios.append(ratio)
         # leaves is not upto date now, need validation again.
         self._leaves = None
+        self._name_index = None
+        self._validate_cache = None
         return self
 
     def _validate(self):
         """Internal helper method to validate this asset class.
 
+        The return value is memoized and reused until this asset class or
+        any of its descendants are modified or renamed.
+
         Returns: A tuple (leaf names, class names) for the subtree containing
         set of all the leaf asset class names and list of all (including
         non-leaf) asset classes.
@@ -220,26 +261,48 @@ class AssetClass:
         Raises: AssertionError If ratio is not a valid float in [0, 1] or if
         the sum of ratio of all the sub-classes doesn't add up to 1.0.
         """
-        if not self._children:
-            self._leaves = {self.name}
-            return self._leaves, [self.name]
+        if not self._child_nodes:
+            if (not self._validate_cache
+                    or self._validate_cache[1][1][0] != self.name):
+                self._leaves = frozenset([self.name])
+                self._name_index = {self.name: (self, 1.0)}
+                self._validate_cache = ([], (self._leaves, [self.name]))
+            return self._validate_cache[1]
 
-        self._leaves = set()
-        class_names = [self.name]
         total = 0.0
-        for asset_class, ratio in self._children:
+        for ratio in self._child_ratios:
             assert ratio >= 0.0 and ratio <= 1.0, (
                 f'Bad ratio provided to Asset Class ({ratio})')
             total += ratio
-            temp_leafs, temp_classes = asset_class._validate()
-            self._leaves.update(temp_leafs)
-            class_names += temp_classes
+        child_results = [
+            asset_class._validate() for asset_class in self._child_nodes]
 
         # Check if all percentages add up to 100%
         assert abs(total - 1) < 1e-6, (
             f'Sum of sub-classes is not 100% (actual: {total * 100}%)')
 
-        return self._leaves, class_names
+        if (self._validate_cache
+                and self._validate_cache[1][1][0] == self.name
+                and all(map(operator.is_, child_results,
+                            self._validate_cache[0]))):
+            # Neither this class nor its subtrees changed since the last call.
+            return self._validate_cache[1]
+
+        leaves = set()
+        class_names = [self.name]
+        name_index = {self.name: (self, 1.0)}
+        for asset_class, ratio, (temp_leafs, temp_classes) in zip(
+                self._child_nodes, self._child_ratios, child_results):
+            leaves.update(temp_leafs)
+            class_names += temp_classes
+            for name, (found, found_ratio) in (
+                    asset_class._name_index.items()):
+                # Keep the first match (in DFS order) for duplicate names.
+                name_index.setdefault(name, (found, found_ratio * ratio))
+        self._leaves = frozenset(leaves)
+        self._name_index = name_index
+        self._validate_cache = (child_results, (self._leaves, class_names))
+        return self._validate_cache[1]
 
     def validate(self):
         """Validates if this asset class tree has any errors.
@@ -255,10 +318,13 @@ class AssetClass:
         tree.
         """
         unused_leaves, all_class_names = self._validate()
-        duplicates = set([x for x in all_class_names
-                          if all_class_names.count(x) > 1])
-
-        assert not duplicates, f'Found duplicate Asset class(es): {duplicates}'
+        # _name_index has one entry per unique class name, so the names only
+        # need to be counted if there are any duplicates.
+        if len(all_class_names) != len(self._name_index):
+            duplicates = {name for name, count
+                          in Counter(all_class_names).items() if count > 1}
+            raise AssertionError(
+                f'Found duplicate Asset class(es): {duplicates}')
         return self
 
     def _check(self):
@@ -290,23 +356,14 @@ class AssetClass:
         method.
         """
         self._check()
-
-        if self.name == asset_class_name:
-            return self, 1.0
-
-        for asset_class, ratio in self._children:
-            ret_value = asset_class.find_asset_class(asset_class_name)
-            if ret_value:
-                return ret_value[0], ret_value[1] * ratio
-
-        return None
+        return self._name_index.get(asset_class_name)
 
     def leaves(self):
         """Returns all leaf asset class names.
 
         validate() must be called before calling this method.
 
-        Returns: A list of leaf asset class names.
+        Returns: A frozenset of leaf asset class names.
 
         Raises: AssertionError if validate is not callled before calling this
         method.
@@ -331,8 +388,11 @@ class AssetClass:
         method.
         """
         self._check()
-        return sum([value for name, value in money_allocation.items()
-                    if name in self._leaves])
+        # Only look up the leaves of this asset class instead of scanning all
+        # of money_allocation. fsum makes the result independent of the
+        # (arbitrary) iteration order of the leaves.
+        return math.fsum(
+            map(money_allocation.get, self._leaves, repeat(0.0)))
 
     class Allocation:
         """This class is a convenience class to represent the return value of
@@ -341,10 +401,15 @@ class AssetClass:
         asset class and its direct children. It is meant to be used as a
         data-only class.
         """
+        __slots__ = ('name', 'value', 'children')
+
         class Children:
             """Class representing a child of Allocation class. This class is
             meant to be used as a data-only class.
             """
+            __slots__ = ('name', 'actual_allocation', 'desired_allocation',
+                         'value', 'value_difference')
+
             def __init__(self, name, actual_allocation, desired_allocation,
                          value, value_difference):
                 """
@@ -398,29 +463,70 @@ class AssetClass:
         Returns: A list of Allocation objects (for itself and any child classes
         based on the levels flag).
         """
-        value = self.value_mapped(money_allocation)
-        actual_alloc = self.Allocation(self.name, value)
-
-        for asset_class, desired_ratio in self._children:
-            actual_ratio = (asset_class.value_mapped(money_allocation) / value
-                            if value != 0 else 0)
-            actual_alloc.add_child(
-                asset_class.name,
-                actual_ratio,
-                desired_ratio)
-
-        ret_val = [actual_alloc]
+        self._check()
+        nodes, values = self._subtree_values(money_allocation, levels)
 
-        if levels == 0:
-            return ret_val
+        ret_val = []
+        for asset_class, node_levels in nodes:
+            if node_levels is None:
+                continue
+            value = values[asset_class]
+            actual_alloc = self.Allocation(asset_class.name, value)
+            if value == 0:
+                # No money is mapped to this subtree, so there is no need to
+                # look up the values of the children.
+                for child, desired_ratio in zip(asset_class._child_nodes,
+                                                asset_class._child_ratios):
+                    actual_alloc.add_child(child.name, 0, desired_ratio)
+            else:
+                for child, desired_ratio in zip(asset_class._child_nodes,
+                                                asset_class._child_ratios):
+                    actual_alloc.add_child(
+                        child.name, values[child] / value, desired_ratio)
+            ret_val.append(actual_alloc)
+        return ret_val
 
-        if levels > 0:
-            levels -= 1
+    def _subtree_values(self, money_allocation, levels):
+        """Helper method to compute the money mapped to all the asset classes
+        in this subtree.
 
-        for asset_class, unused_ratio in self._children:
-            ret_val += asset_class.return_allocation(money_allocation, levels)
+        Args:
+            money_allocation: A map of leaf_class_name -> money.
+            levels: How many levels of child allocation to return (-1 = all).
 
-        return ret_val
+        Returns: A tuple (nodes, values). nodes is a list of (asset class,
+        levels) for all the asset classes in this subtree in pre-order, where
+        levels is None for asset classes whose allocation is not to be
+        returned. values is a dict of asset class -> money mapped to it.
+        """
+        # All the asset classes in this subtree (in pre-order) along with the
+        # levels of child allocation to return for them. levels is None for
+        # asset classes that are only needed to compute the values of their
+        # ancestors.
+        nodes = []
+        stack = [(self, levels)]
+        while stack:
+            asset_class, node_levels = stack.pop()
+            nodes.append((asset_class, node_levels))
+            if node_levels is None or node_levels == 0:
+                child_levels = None
+            else:
+                child_levels = (node_levels - 1 if node_levels > 0
+                                else node_levels)
+            stack.extend((child, child_levels)
+                         for child in reversed(asset_class._child_nodes))
+
+        # Compute the money mapped to every asset class exactly once. In
+        # reverse pre-order, children are always visited before their parents.
+        values = {}
+        for asset_class, unused_levels in reversed(nodes):
+            if asset_class._child_nodes:
+                values[asset_class] = math.fsum(
+                    map(values.__getitem__, asset_class._child_nodes))
+            else:
+                values[asset_class] = money_allocation.get(
+                    asset_class.name, 0.0)
+        return nodes, values
 
 
 class Portfolio:
@@ -437,20 +543,30 @@ class Portfolio:
             allocation.
         """
         self._accounts = {}
-        self.asset_classes = asset_classes.validate()
+        self.asset_classes = asset_classes
+
+    @property
+    def asset_classes(self):
+        """The AssetClass object representing the desired asset allocation."""
+        return self._asset_classes
+
+    @asset_classes.setter
+    def asset_classes(self, asset_classes):
+        self._asset_classes = asset_classes.validate()
         self._leaf_asset_classes = asset_classes.leaves()
+        # Leaf asset class name -> its desired (absolute) ratio.
+        self._leaf_ratios = {
+            name: asset_classes.find_asset_class(name)[1]
+            for name in self._leaf_asset_classes}
 
     def save(self, filename):
-        """Save this portfolio to a file."""
-        with open(filename, 'w') as f:
-            yaml.dump(self.to_dict(), f, sort_keys=False)
+        """Save this portfolio to a file (see utils.save_yaml)."""
+        utils.save_yaml(self.to_dict(), filename)
 
     @classmethod
     def load(cls, filename):
         """Loads and returns portfolio from file."""
-        with open(filename) as f:
-            d = yaml.load(f.read(), Loader=yaml.SafeLoader)
-        return cls.from_dict(d)
+        return cls.from_dict(utils.load_yaml(filename))
 
     def to_dict(self):
         """Returns a dictionary representation of this portfolio."""
@@ -484,10 +600,12 @@ class Portfolio:
             AssertError: If another account with the same exists in the
             portfolio and replace=False.
         """
-        for asset in account.assets():
-            for asset_class in asset.class2ratio.keys():
-                assert asset_class in self._leaf_asset_classes, (
-                    f'Unknown or non-leaf asset class: {asset_class}')
+        unknown_asset_classes = set().union(
+            *[asset.class2ratio.keys() for asset in account.assets()]
+        ).difference(self._leaf_asset_classes)
+        assert not unknown_asset_classes, (
+            'Unknown or non-leaf asset class: '
+            f'{", ".join(sorted(map(str, unknown_asset_classes)))}')
 
         assert replace or account.name() not in self._accounts, (
             f'Attempting to add duplicate account: {account.name()}')
@@ -516,17 +634,19 @@ class Portfolio:
         Raises: AssertionError if more than one or none of the accounts match
         the account_str.
         """
+        matched_account = None
+        for account_name in self._accounts:
+            if account_str not in account_name:
+                continue
+            if matched_account is not None:
+                raise AssertionError(f'{account_str} matches more than one '
+                                     'account in the portfolio')
+            matched_account = account_name
 
-        matched_accounts = list(
-            filter(lambda x: x.count(account_str),
-                   [account.name() for account in self.accounts()]))
-        if len(matched_accounts) == 0:
+        if matched_account is None:
             raise AssertionError(f'{account_str} does not match any account '
                                  'in the portfolio')
-        if len(matched_accounts) > 1:
-            raise AssertionError(f'{account_str} matches more than one '
-                                 'account in the portfolio')
-        return matched_accounts[0]
+        return matched_account
 
     def get_asset_name_by_substr(self, account_str='', asset_str=''):
         """Returns asset names given a sub-string for account and asset.
@@ -543,21 +663,28 @@ class Portfolio:
 
         Raises: AssertionError if none or more than one asset matches the
         sub-strings."""
-        matched_assets = list(filter(
-            lambda x: x[0].count(account_str) and (
-                x[1].count(asset_str) or x[2] == asset_str),
-            [(account.name(), asset.name(), asset.short_name())
-             for account in self.accounts()
-             for asset in account.assets()]))
-        if len(matched_assets) < 1:
+        matched_asset = None
+        for account in self.accounts():
+            if account_str not in account.name():
+                continue
+            for asset in account.assets():
+                # Check the short name first, as asset.name() may need to
+                # read a cached value from disk for some assets.
+                if not (not asset_str
+                        or asset.short_name() == asset_str
+                        or asset_str in asset.name()):
+                    continue
+                if matched_asset is not None:
+                    raise AssertionError(
+                        'Provided asset and account strings match more '
+                        'than one assets.')
+                matched_asset = account.name(), asset.short_name()
+
+        if matched_asset is None:
             raise AssertionError(
                 'Provided asset and account strings match none '
                 'of the assets.')
-        if len(matched_assets) > 1:
-            raise AssertionError(
-                'Provided asset and account strings match more '
-                'than one assets.')
-        return matched_assets[0][0], matched_assets[0][2]
+        return matched_asset
 
     def what_if(self, account_name, asset_name, delta):
         """Changes value of an asset by delta.
@@ -615,32 +742,44 @@ class Portfolio:
                       + (['str'] if long_name else [])
                       + ['delta_dollars']))
 
+        for account, asset, delta in self._iter_what_ifs():
+            if asset is None:
+                account_whatifs.add_row([account.name(), delta])
+                continue
+
+            row = ([account.name()]
+                   + ([asset.short_name()] if short_name else [])
+                   + ([asset.name()] if long_name else [])
+                   + [delta])
+            if quantity:
+                row.insert(1 + short_name,
+                           str(round(delta / asset.price()))
+                           if hasattr(asset, 'price') else None)
+            asset_whatifs.add_row(row)
+
+        return account_whatifs, asset_whatifs
+
+    def _iter_what_ifs(self):
+        """Yields all non-zero what ifs in this portfolio.
+
+        Yields: Tuples (account, asset, delta). For what ifs on the available
+        cash of an account, asset is None.
+        """
         for account in self.accounts():
             if account.available_cash() != 0.0:
-                account_whatifs.add_row(
-                    [account.name(), account.available_cash()])
-
+                yield account, None, account.available_cash()
             for asset in account.assets():
                 delta = asset.get_what_if()
                 if delta != 0.0:
-                    row = ([account.name()]
-                           + ([asset.short_name()] if short_name else [])
-                           + ([asset.name()] if long_name else [])
-                           + [delta])
-                    if quantity:
-                        row.insert(1 + short_name,
-                                   str(round(delta / asset.price()))
-                                   if hasattr(asset, 'price') else None)
-                    asset_whatifs.add_row(row)
-
-        return account_whatifs, asset_whatifs
+                    yield account, asset, delta
 
     def reset_what_ifs(self):
         """Reset all previously set what ifs in this portfolio."""
-        for account in self.accounts():
-            account.add_cash(-account.available_cash())
-            for asset in account.assets():
-                asset.what_if(-asset.get_what_if())
+        for account, asset, delta in list(self._iter_what_ifs()):
+            if asset is None:
+                account.add_cash(-delta)
+            else:
+                asset.what_if(-delta)
 
     def prefetch(self):
         """Prefetches all cached assets."""
@@ -790,46 +929,82 @@ class Portfolio:
         The columns of the table correspond to Asset class name, account type,
         percentage allocation to account type and total monetary value.
         """
-        class2type = {}  # Mapping of asset class -> account type -> money
-        for account in self.accounts():
-            for asset in account.assets():
-                for name, ratio in asset.class2ratio.items():
-                    if name not in class2type:
-                        class2type[name] = {}
-                    class2type[name][account.account_type] = (
-                        class2type[name].get(account.account_type, 0)
-                        + ratio * asset.adjusted_value())
+        (class_index, type_index, class_ids, type_ids,
+         contributions) = self._snapshot()
 
         table = Table(
             4,
             headers=['Asset Class', 'Account Type', 'Percentage', 'Value'],
             coltypes=['str', 'str', 'percentage_1', 'dollars'])
+        if not contributions:
+            return table
 
-        for asset_class, type2value in class2type.items():
-            first = True
-            total = sum(type2value.values())
+        # Mapping of (asset class, account type) -> money. The keys are in
+        # order of the first contribution to them.
+        class_type2value = {}
+        for key, contribution in zip(zip(class_ids, type_ids), contributions):
+            class_type2value[key] = (
+                class_type2value.get(key, 0.0) + contribution)
+        class_totals = [0.0] * len(class_index)
+        for (class_id, unused_type_id), value in class_type2value.items():
+            class_totals[class_id] += value
+
+        asset_classes = list(class_index)
+        account_types = list(type_index)
+        last_class_id = None
+        # Group by asset class (in order of appearance) and sort account types
+        # by value, keeping the order of appearance for ties.
+        for (class_id, type_id), value in sorted(
+                class_type2value.items(),
+                key=lambda item: (item[0][0], -item[1])):
+            total = class_totals[class_id]
             if abs(total) < 1e-6:
                 continue
-            for account_type, value in sorted(
-                    type2value.items(),
-                    key=lambda x: x[1],
-                    reverse=True):
-                table.add_row([asset_class if first else '', account_type,
-                               value / total, value])
-                first = False
+            table.add_row([asset_classes[class_id]
+                           if class_id != last_class_id else '',
+                           account_types[type_id],
+                           value / total,
+                           value])
+            last_class_id = class_id
         return table
 
-    def _get_asset_class_to_value(self):
-        """Returns asset class name -> money allocated to it."""
-        asset_class_to_value = {}
+    def _snapshot(self):
+        """Returns the money mapped to asset classes by all the assets.
 
+        Returns: A tuple (class_index, type_index, class_ids, type_ids,
+        contributions). class_index and type_index map asset class names
+        and account types to indices (in order of appearance). The three
+        lists have one entry per (asset, asset class) pair: the index of the
+        asset class, the index of the account type and the money mapped to
+        the asset class.
+        """
+        class_index = {}
+        type_index = {}
+        class_ids = []
+        type_ids = []
+        contributions = []
         for account in self.accounts():
+            type_id = type_index.setdefault(
+                account.account_type, len(type_index))
             for asset in account.assets():
+                value = asset.adjusted_value()
                 for name, ratio in asset.class2ratio.items():
-                    asset_class_to_value[name] = asset_class_to_value.get(
-                        name, 0) + ratio * asset.adjusted_value()
+                    class_ids.append(
+                        class_index.setdefault(name, len(class_index)))
+                    type_ids.append(type_id)
+                    contributions.append(ratio * value)
 
-        return asset_class_to_value
+        return class_index, type_index, class_ids, type_ids, contributions
+
+    def _get_asset_class_to_value(self):
+        """Returns asset class name -> money allocated to it."""
+        (class_index, unused_type_index, class_ids, unused_type_ids,
+         contributions) = self._snapshot()
+        if not class_ids:
+            return {}
+        totals = np.bincount(class_ids, weights=contributions,
+                             minlength=len(class_index))
+        return dict(zip(class_index, totals.tolist()))
 
     def asset_allocation_tree(self, levels=-1):
         """Returns asset allocation in long vertical tree format.
@@ -850,22 +1025,37 @@ class Portfolio:
                       headers=['Class', 'Actual%', 'Desired%', 'Value'],
                       coltypes=['str', 'percentage_1', 'percentage_1',
                                 'dollars'])
-        first_row = True
+        rows = []
         for alloc in self.asset_classes.return_allocation(
                 self._get_asset_class_to_value(), levels):
             if not alloc.children:
                 continue
 
-            if not first_row:
-                table.add_row([' '])
-            first_row = False
-            table.add_row([f'{alloc.name}:'])
-            for child in alloc.children:
-                table.add_row([child.name,
-                              child.actual_allocation,
-                              child.desired_allocation,
-                              child.value])
-        return table
+            if rows:
+                rows.append([' '])
+            rows.append([f'{alloc.name}:'])
+            rows.extend([child.name,
+                         child.actual_allocation,
+                         child.desired_allocation,
+                         child.value] for child in alloc.children)
+        return table.add_rows(rows)
+
+    def _leaf_allocation(self, leaf_list, money_allocation):
+        """Returns allocation across leaf_list (all the leaf asset classes).
+
+        This is equivalent to (but faster than) building a tree with leaf_list
+        as the children and calling return_allocation on it.
+
+        Returns: An AssetClass.Allocation object.
+        """
+        values = [money_allocation.get(name, 0.0) for name in leaf_list]
+        total = math.fsum(values)
+        alloc = AssetClass.Allocation('Root', total)
+        for name, value in zip(leaf_list, values):
+            alloc.add_child(name,
+                            value / total if total != 0 else 0,
+                            self._leaf_ratios[name])
+        return alloc
 
     def asset_allocation(self, asset_class_list):
         """Returns asset allocation across the asset classes provided.
@@ -891,22 +1081,30 @@ class Portfolio:
         Raises: AssertionError is the asset_class_list is not a proper
         "cut" of the asset class tree.
         """
-        flat_asset_class = AssetClass('Root')
-        for asset_class in asset_class_list:
-            found = self.asset_classes.find_asset_class(asset_class)
-            assert found, f'Could not find {asset_class}'
-            flat_asset_class.add_subclass(found[1], found[0])
-
-        try:
-            flat_asset_class.validate()
-        except AssertionError:
-            raise AssertionError(
-                'AssetAllocation called with overlapping '
-                'Asset Classes or Asset Classes which does not cover the '
-                'full tree.') from None
-
-        alloc = flat_asset_class.return_allocation(
-            self._get_asset_class_to_value(), 0)[0]
+        money_allocation = self._get_asset_class_to_value()
+        asset_class_set = set(asset_class_list)
+        if (len(asset_class_set) == len(asset_class_list)
+                and asset_class_set == self._leaf_asset_classes):
+            # Common case: The leaves are always a valid "cut" of the tree,
+            # so there is no need to build and validate a new tree.
+            alloc = self._leaf_allocation(asset_class_list, money_allocation)
+        else:
+            flat_asset_class = AssetClass('Root')
+            for asset_class in asset_class_list:
+                found = self.asset_classes.find_asset_class(asset_class)
+                assert found, f'Could not find {asset_class}'
+                flat_asset_class.add_subclass(found[1], found[0])
+
+            try:
+                flat_asset_class.validate()
+            except AssertionError:
+                raise AssertionError(
+                    'AssetAllocation called with overlapping '
+                    'Asset Classes or Asset Classes which does not cover the '
+                    'full tree.') from None
+
+            alloc = flat_asset_class.return_allocation(
+                money_allocation, 0)[0]
         table = Table(
             5,
             headers=['Class', 'Actual%', 'Desired%', 'Value', 'Difference'],
@@ -936,52 +1134,61 @@ class Portfolio:
         mapped to the leaf node, and the difference from the desired
         value of assets mapped to the leaf node, respectively.
         """
-        def find_index(class_name, ret_list):
-            # We assume ret_list has atleast one entry.
-            names_list = [row[-3] for row in ret_list]
-            return names_list.index(class_name)
-
-        ret_list = []
-        for alloc in self.asset_classes.return_allocation(
-                self._get_asset_class_to_value()):
-            if not alloc.children:
-                continue
-
-            if not ret_list:
-                for child in alloc.children:
-                    ret_list.append([child.name,
-                                     child.actual_allocation,
-                                     child.desired_allocation])
-            else:  # Parent is already in ret_list
-                index = find_index(alloc.name, ret_list)
-                # We know that here is atleast one child.
-                for i in range(len(alloc.children) - 1):
-                    # Make room for rest of the children by inserting empty
-                    # extra rows of the same size as the parent's row
-                    ret_list.insert(index + 1, [None] * len(ret_list[index]))
-                for i in range(len(alloc.children)):
-                    ret_list[index + i].extend(
-                        [alloc.children[i].name,
-                         alloc.children[i].actual_allocation,
-                         alloc.children[i].desired_allocation])
+        money_allocation = self._get_asset_class_to_value()
+        nodes, values = self.asset_classes._subtree_values(
+            money_allocation, -1)
+        parents = [asset_class for asset_class, unused_levels in nodes
+                   if asset_class._child_nodes]
 
         # Return early if there is no AA.
-        if not ret_list:
+        if not parents:
             return Table(0)
 
+        # Each row corresponds to a path from the root to a leaf. Compute the
+        # number of rows spanned by each asset class and the depth of its
+        # subtree first, so that the rows can be allocated upfront and filled
+        # in directly. parents is in pre-order, hence a reverse scan sees
+        # children before their parents.
+        num_rows = {}
+        depth = {}
+        for parent in reversed(parents):
+            num_rows[parent] = sum(
+                num_rows.get(child, 1) for child in parent._child_nodes)
+            depth[parent] = 1 + max(
+                depth.get(child, 0) for child in parent._child_nodes)
+
+        # Three columns per level of the tree, followed by the leaf node AA.
+        cols = 3 * depth[parents[0]]
+        ret_list = [[None] * (cols + 4) for _ in range(num_rows[parents[0]])]
+        # Asset class -> (first row, number of columns before it).
+        position = {parents[0]: (0, 0)}
+        for parent in parents:
+            index, offset = position[parent]
+            value = values[parent]
+            for child, desired_ratio in zip(parent._child_nodes,
+                                            parent._child_ratios):
+                ret_list[index][offset:offset + 3] = [
+                    child.name,
+                    values[child] / value if value != 0 else 0,
+                    desired_ratio]
+                position[child] = (index, offset + 3)
+                index += num_rows.get(child, 1)
+
         # By this time ret_list has all the AA tree.
         # Add Leaf node AA at the end.
-        cols = max(map(len, ret_list))
-        leaf_aa = self.asset_allocation(self.asset_classes.leaves())
-        for leaf_row in leaf_aa.list():  # Format: Class, A%, D%, Value, Diff
-            ret_list_row = ret_list[find_index(leaf_row[0], ret_list)]
-            ret_list_row.extend([None] * (cols - len(ret_list_row)))
-            ret_list_row.extend(leaf_row[1:])
+        leaves = [asset_class for asset_class, unused_levels in nodes
+                  if not asset_class._child_nodes]
+        total = math.fsum(values[leaf] for leaf in leaves)
+        for leaf in leaves:
+            actual = values[leaf] / total if total != 0 else 0
+            desired = self._leaf_ratios[leaf.name]
+            ret_list[position[leaf][0]][cols:] = [
+                actual, desired, actual * total, (desired - actual) * total]
 
         # All done, now build the table.
         t = Table(cols + 4,
                   headers=['Class', 'A%', 'D%'] * int(cols / 3)
-                  + leaf_aa.headers()[1:],
+                  + ['Actual%', 'Desired%', 'Value', 'Difference'],
                   coltypes=['str', 'percentage', 'percentage'] * int(cols / 3)
                   + ['percentage_1', 'percentage_1', 'dollars',
                       'delta_dollars'])
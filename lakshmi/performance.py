@@ -2,21 +2,43 @@
 and computing portfolio's performance."""
 
 import bisect
+import datetime
+import functools
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-import yaml
+import numpy as np
 from pyxirr import xirr
 
 from lakshmi import utils
 from lakshmi.table import Table
 
 
+def _to_date(date):
+    """Returns a datetime.date object for date (in 'YYYY/MM/DD' format).
+
+    This is faster than datetime.strptime, but date must already be
+    validated (e.g. via utils.validate_date).
+    """
+    year, month, day = date.split('/')
+    return datetime.date(int(year), int(month), int(day))
+
+
+def _to_str(date):
+    """Returns date (a datetime.date object) in 'YYYY/MM/DD' format.
+
+    This is faster than date.strftime.
+    """
+    return f'{date.year:04d}/{date.month:02d}/{date.day:02d}'
+
+
 class Checkpoint:
     """Class representing a single checkpoint of the portfolio. Each checkpoint
     represents a single day. The checkpoint contains the portfolio value, and
     money inflows and outflows on that day.
     """
+    __slots__ = ('_date', '_date_obj', '_portfolio_value', '_inflow',
+                 '_outflow')
 
     def __init__(self, checkpoint_date, portfolio_value, inflow=0, outflow=0):
         """Constructs a new checkpoint for the given date.
@@ -28,6 +50,7 @@ class Checkpoint:
             outflow: The amount of money flowing out of the portfolio on date.
         """
         self._date = utils.validate_date(checkpoint_date)
+        self._date_obj = _to_date(self._date)
 
         assert portfolio_value > 0, 'Portfolio value must be positive'
         assert inflow >= 0, 'Inflow must be non-negative'
@@ -90,6 +113,10 @@ class Checkpoint:
         """Returns date of this checkpoint in 'YYYY/MM/DD' format."""
         return self._date
 
+    def get_date_obj(self):
+        """Returns date of this checkpoint as a datetime.date object."""
+        return self._date_obj
+
     def get_portfolio_value(self):
         """Returns the checkpoint's portfolio value."""
         return self._portfolio_value
@@ -106,21 +133,23 @@ class Checkpoint:
 class Timeline:
     """Class representing a collection of checkpoints."""
 
-    _DATE_FMT = '%Y/%m/%d'
+    # Maximum number of PerformanceData objects cached by a timeline.
+    _PERFORMANCE_DATA_CACHE_SIZE = 32
 
     def __init__(self, checkpoints):
         """Returns a new object given a list of checkpoints."""
         assert len(checkpoints) > 0
 
         self._checkpoints = {}
-        self._dates = []
         for cp in checkpoints:
             cp_date = cp.get_date()
-            assert cp_date not in self._dates, (
+            assert cp_date not in self._checkpoints, (
                 f'Cannot have two checkpoints with the same date ({cp_date})')
-            self._dates.append(cp_date)
             self._checkpoints[cp_date] = cp
-        self._dates.sort()
+        # Saved timelines are already sorted, in which case sort() only
+        # takes a single linear pass.
+        self._dates = sorted(self._checkpoints)
+        self._invalidate()
 
     def to_list(self):
         """Returns this object as a list of checkpoints."""
@@ -151,13 +180,11 @@ class Timeline:
                       coltypes=['str', 'dollars', 'dollars', 'dollars'])
         begin_pos = bisect.bisect_left(self._dates, begin) if begin else None
         end_pos = bisect.bisect_right(self._dates, end) if end else None
-        for date in self._dates[begin_pos:end_pos]:
-            cp = self._checkpoints[date]
-            table.add_row([cp.get_date(),
-                           cp.get_portfolio_value(),
-                           cp.get_inflow(),
-                           cp.get_outflow()])
-        return table
+        checkpoints = map(self._checkpoints.get,
+                          self._dates[begin_pos:end_pos])
+        return table.add_rows(
+            [[cp.get_date(), cp.get_portfolio_value(), cp.get_inflow(),
+              cp.get_outflow()] for cp in checkpoints])
 
     def has_checkpoint(self, date):
         """Retuns true iff there is a checkpoint for date."""
@@ -179,16 +206,17 @@ class Timeline:
     @staticmethod
     def _interpolate_checkpoint(date, checkpoint1, checkpoint2):
         """Given checkpoints 1 and 2, returns new checkpoint for date."""
-        date1 = datetime.strptime(checkpoint1.get_date(), Timeline._DATE_FMT)
-        date2 = datetime.strptime(checkpoint2.get_date(), Timeline._DATE_FMT)
-        given_date = datetime.strptime(date, Timeline._DATE_FMT)
+        # Day ordinals avoid going through timedelta arithmetic.
+        day1 = checkpoint1.get_date_obj().toordinal()
+        day2 = checkpoint2.get_date_obj().toordinal()
+        given_day = _to_date(date).toordinal()
         val1 = checkpoint1.get_portfolio_value()
         val2 = (checkpoint2.get_portfolio_value()
                 - checkpoint2.get_inflow()
                 + checkpoint2.get_outflow())
 
         interpolated_value = val1 + (val2 - val1) * (
-            (given_date - date1) / (date2 - date1))
+            (given_day - day1) / (day2 - day1))
         return Checkpoint(date, interpolated_value)
 
     def get_checkpoint(self, date, interpolate=False):
@@ -214,10 +242,14 @@ class Timeline:
             AssertError, If date is not without the range of checkpoints in
             this timeline.
         """
-        date = utils.validate_date(date)
+        return self._get_checkpoint(utils.validate_date(date), interpolate)
 
-        if self.has_checkpoint(date):
-            return self._checkpoints[date]
+    def _get_checkpoint(self, date, interpolate):
+        """Same as get_checkpoint, but date must already be in the canonical
+        YYYY/MM/DD format (i.e. returned by utils.validate_date)."""
+        checkpoint = self._checkpoints.get(date)
+        if checkpoint is not None:
+            return checkpoint
 
         # date is not one of the saved checkpoints...
 
@@ -225,7 +257,7 @@ class Timeline:
 
         # ... and it's OK to interpolate
 
-        assert self.covers(date), (
+        assert self.begin() <= date <= self.end(), (
             f'{date} is not in the range of the saved checkpoints. '
             f'Begin={self.begin()}, End={self.end()}')
 
@@ -249,14 +281,14 @@ class Timeline:
         """
         date = checkpoint.get_date()
 
-        if replace and self.has_checkpoint(date):
+        self._invalidate()
+        if replace and date in self._checkpoints:
             self._checkpoints[date] = checkpoint
             return
 
-        assert not self.has_checkpoint(date), (
+        assert date not in self._checkpoints, (
             f'Cannot insert two checkpoints with the same date ({date}).')
-        pos = bisect.bisect(self._dates, date)
-        self._dates.insert(pos, date)
+        bisect.insort(self._dates, date)
         self._checkpoints[date] = checkpoint
 
     def delete_checkpoint(self, date):
@@ -264,15 +296,49 @@ class Timeline:
         date = utils.validate_date(date)
         assert date in self._checkpoints
         self._checkpoints.pop(date)
-        self._dates.remove(date)
+        del self._dates[bisect.bisect_left(self._dates, date)]
+        self._invalidate()
+
+    def _invalidate(self):
+        """Resets the values cached from the checkpoints in this timeline."""
+        # Cached output of _get_arrays.
+        self._arrays = None
+        # Cached PerformanceData objects, keyed by (begin, end) dates, in
+        # order of least to most recently used.
+        self._performance_data = {}
+
+    def _get_arrays(self):
+        """Returns the dates, inflows and outflows of all the checkpoints.
+
+        Returns: A tuple of five NumPy arrays (in order of the checkpoint
+        dates) for dates (datetime64), inflows, outflows, cumulative inflows
+        and cumulative outflows respectively. The cumulative arrays have an
+        extra leading zero, so that the sum of the cashflows in [i, j) is
+        cumulative[j] - cumulative[i]. The arrays are cached until the
+        timeline is modified.
+        """
+        if self._arrays is None:
+            checkpoints = [self._checkpoints[date] for date in self._dates]
+            inflows = np.array([cp.get_inflow() for cp in checkpoints],
+                               dtype=float)
+            outflows = np.array([cp.get_outflow() for cp in checkpoints],
+                                dtype=float)
+            self._arrays = (
+                np.array([cp.get_date_obj() for cp in checkpoints],
+                         dtype='datetime64[D]'),
+                inflows,
+                outflows,
+                np.concatenate(([0.0], np.cumsum(inflows))),
+                np.concatenate(([0.0], np.cumsum(outflows))))
+        return self._arrays
 
     @dataclass
     class PerformanceData:
-        # List of dates (datetime objects). Used to compute XIRR.
-        dates: list
-        # List of cashflows on the above dates. Money flowing out of portfolio
-        # is considered positive. Used to compute XIRR.
-        amounts: list
+        # Array of dates (datetime64). Used to compute XIRR.
+        dates: np.ndarray
+        # Array of cashflows on the above dates. Money flowing out of
+        # portfolio is considered positive. Used to compute XIRR.
+        amounts: np.ndarray
         # Beginning balance.
         begin_balance: float
         # Ending balance.
@@ -282,6 +348,11 @@ class Timeline:
         # Sum of all outflows from the portfolio.
         outflows: float = 0.0
 
+        @functools.cached_property
+        def irr(self):
+            """Returns the XIRR of the cashflows (computed only once)."""
+            return xirr(self.dates, self.amounts)
+
     def get_performance_data(self, begin, end):
         """Returns data in a format to help calculate XIRR.
 
@@ -291,42 +362,52 @@ class Timeline:
             end: End date in YYYY/MM/DD format. If None, ends at the last
             checkpoint date.
 
-        Returns: PerformanceData object.
+        Returns: PerformanceData object. The returned object is cached (for
+        the most recently used dates) until this timeline is modified, hence
+        it should not be modified.
         """
-        if not begin:
-            begin = self.begin()
-        if not end:
-            end = self.end()
-
-        assert utils.validate_date(begin) != utils.validate_date(end)
-
-        dates = []
-        amounts = []
-        inflows = 0.0
-        outflows = 0.0
-
-        begin_checkpoint = self.get_checkpoint(begin, True)
-        dates.append(datetime.strptime(begin_checkpoint.get_date(),
-                                       Timeline._DATE_FMT))
-        amounts.append(-begin_checkpoint.get_portfolio_value())
-
-        begin_pos = bisect.bisect_right(self._dates, begin)
+        begin = utils.validate_date(begin) if begin else self.begin()
+        end = utils.validate_date(end) if end else self.end()
+        assert begin != end
+
+        key = (begin, end)
+        data = self._performance_data.pop(key, None)
+        if data is None:
+            data = self._compute_performance_data(begin, end)
+            if (len(self._performance_data)
+                    >= Timeline._PERFORMANCE_DATA_CACHE_SIZE):
+                # Evict the least recently used entry.
+                del self._performance_data[next(iter(self._performance_data))]
+        self._performance_data[key] = data
+        return data
+
+    def _compute_performance_data(self, begin, end):
+        """Returns a new PerformanceData object for canonical dates
+        begin and end."""
+        begin_checkpoint = self._get_checkpoint(begin, True)
+        end_checkpoint = self._get_checkpoint(end, True)
+
+        # Cashflows of the checkpoints strictly between begin and end (none
+        # if begin is after end).
         end_pos = bisect.bisect_left(self._dates, end)
-        for date in self._dates[begin_pos:end_pos]:
-            dates.append(datetime.strptime(date, Timeline._DATE_FMT))
-            checkpoint = self._checkpoints[date]
-            amounts.append(checkpoint.get_outflow() - checkpoint.get_inflow())
-            inflows += checkpoint.get_inflow()
-            outflows += checkpoint.get_outflow()
-
-        end_checkpoint = self.get_checkpoint(end, True)
-        dates.append(
-            datetime.strptime(end_checkpoint.get_date(), Timeline._DATE_FMT))
-        amounts.append(end_checkpoint.get_portfolio_value()
-                       + end_checkpoint.get_outflow()
-                       - end_checkpoint.get_inflow())
-        inflows += end_checkpoint.get_inflow()
-        outflows += end_checkpoint.get_outflow()
+        begin_pos = min(bisect.bisect_right(self._dates, begin), end_pos)
+        (all_dates, all_inflows, all_outflows,
+         inflows_cum, outflows_cum) = self._get_arrays()
+
+        dates = np.concatenate((
+            np.array([begin_checkpoint.get_date_obj()], dtype=all_dates.dtype),
+            all_dates[begin_pos:end_pos],
+            np.array([end_checkpoint.get_date_obj()], dtype=all_dates.dtype)))
+        amounts = np.concatenate((
+            [-begin_checkpoint.get_portfolio_value()],
+            all_outflows[begin_pos:end_pos] - all_inflows[begin_pos:end_pos],
+            [end_checkpoint.get_portfolio_value()
+             + end_checkpoint.get_outflow()
+             - end_checkpoint.get_inflow()]))
+        inflows = (float(inflows_cum[end_pos] - inflows_cum[begin_pos])
+                   + end_checkpoint.get_inflow())
+        outflows = (float(outflows_cum[end_pos] - outflows_cum[begin_pos])
+                    + end_checkpoint.get_outflow())
         return Timeline.PerformanceData(
             dates=dates, amounts=amounts, inflows=inflows, outflows=outflows,
             begin_balance=begin_checkpoint.get_portfolio_value(),
@@ -336,12 +417,14 @@ class Timeline:
 class Performance:
     """Class to compute performance stats given a Timeline object."""
 
-    _TIME_PERIODS = [timedelta(days=30),
+    _TIME_PERIODS = (timedelta(days=30),
                      timedelta(days=30) * 3,
                      timedelta(days=30) * 6,
                      timedelta(days=365),
                      timedelta(days=365) * 3,
-                     timedelta(days=365) * 10]
+                     timedelta(days=365) * 10)
+    # Length of _TIME_PERIODS in days (used for bisecting).
+    _TIME_PERIODS_DAYS = tuple(period.days for period in _TIME_PERIODS)
     _TIME_PERIODS_NAMES = ['1 Month',
                            '3 Months',
                            '6 Months',
@@ -368,24 +451,27 @@ class Performance:
         return ret_obj
 
     def save(self, filename):
-        """Save this Object to a file."""
-        with open(filename, 'w') as f:
-            yaml.dump(self.to_dict(), f)
+        """Save this Object to a file (see utils.save_yaml)."""
+        utils.save_yaml(self.to_dict(), filename)
 
     @classmethod
     def load(cls, filename):
         """Load Performance object from a file."""
-        with open(filename) as f:
-            return cls.from_dict(yaml.load(f.read(), Loader=yaml.SafeLoader))
+        return cls.from_dict(utils.load_yaml(filename))
+
+    def _get_periods(self, timeline_days=None):
+        """Returns periods for which summary stats should be printed.
 
-    def _get_periods(self):
-        """Returns periods for which summary stats should be printed."""
+        Args:
+            timeline_days: Number of days covered by the timeline. Computed
+            from the timeline if not specified.
+        """
         # We only show 3 _TIME_PERIODS based on timeline_period
-        timeline_period = (
-            datetime.strptime(self._timeline.end(), Timeline._DATE_FMT)
-            - datetime.strptime(self._timeline.begin(), Timeline._DATE_FMT))
-        end_index = bisect.bisect_left(Performance._TIME_PERIODS,
-                                       timeline_period)
+        if timeline_days is None:
+            timeline_days = (_to_date(self._timeline.end())
+                             - _to_date(self._timeline.begin())).days
+        end_index = bisect.bisect_left(Performance._TIME_PERIODS_DAYS,
+                                       timeline_days)
         begin_index = max(0, end_index - 3)
         return (Performance._TIME_PERIODS[begin_index:end_index],
                 Performance._TIME_PERIODS_NAMES[begin_index:end_index])
@@ -396,7 +482,7 @@ class Performance:
         change = perf_data.end_balance - perf_data.begin_balance
         return [period_name, perf_data.inflows, perf_data.outflows,
                 change, change / perf_data.begin_balance,
-                xirr(perf_data.dates, perf_data.amounts)]
+                perf_data.irr]
 
     def summary_table(self):
         """Returns summary of performance during different periods."""
@@ -405,24 +491,27 @@ class Performance:
                                'Portfolio Change', 'Change %', 'IRR'],
                       coltypes=['str', 'dollars', 'dollars', 'delta_dollars',
                                 'percentage_1', 'percentage_1'])
+        begin = self._timeline.begin()
+        end = self._timeline.end()
         # Not enough data for any points.
-        if self._timeline.begin() == self._timeline.end():
+        if begin == end:
             return table
 
-        # Add rows for atmost 3 periods.
-        periods, period_names = self._get_periods()
-        for period, period_name in zip(periods, period_names):
-            begin_date_str = (
-                datetime.strptime(self._timeline.end(), Timeline._DATE_FMT)
-                - period).strftime(Timeline._DATE_FMT)
-            table.add_row(Performance._create_summary_row(
-                period_name, self._timeline.get_performance_data(
-                    begin_date_str, self._timeline.end())))
+        # Add rows for atmost 3 periods (there are none if the timeline
+        # is shorter than the smallest period).
+        end_date = _to_date(end)
+        timeline_days = (end_date - _to_date(begin)).days
+        if timeline_days > Performance._TIME_PERIODS_DAYS[0]:
+            periods, period_names = self._get_periods(timeline_days)
+            for period, period_name in zip(periods, period_names):
+                begin_date_str = _to_str(end_date - period)
+                table.add_row(Performance._create_summary_row(
+                    period_name, self._timeline.get_performance_data(
+                        begin_date_str, end)))
 
         # Add row for 'Overall' time period
         table.add_row(Performance._create_summary_row(
-            'Overall', self._timeline.get_performance_data(
-                self._timeline.begin(), self._timeline.end())))
+            'Overall', self._timeline.get_performance_data(begin, end)))
         return table
 
     def get_info(self, begin, end):
@@ -451,7 +540,7 @@ class Performance:
 
         table = Table(2, coltypes=['str', 'str'])
         growth = round(100 * change / data.begin_balance, 1)
-        irr = round(100 * xirr(data.dates, data.amounts), 1)
+        irr = round(100 * data.irr, 1)
         table.set_rows([
             ['Start date', begin],
             ['End date', end],
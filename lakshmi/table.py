@@ -18,8 +18,8 @@ class Table():
     # 'float': Float.
     coltype2func = {
         'str': lambda x: x,
-        'dollars': lambda x: utils.format_money(x),
-        'delta_dollars': lambda x: utils.format_money_delta(x),
+        'dollars': utils.format_money,
+        'delta_dollars': utils.format_money_delta,
         'percentage': lambda x: f'{round(100 * x)}%',
         'percentage_1': lambda x: f'{round(100 * x, 1)}%',
         'float': lambda x: str(float(x)),
@@ -58,6 +58,12 @@ class Table():
             self._coltypes = coltypes
         else:
             self._coltypes = ['str'] * self._numcols
+        # Functions to format and alignments of each column (resolved once
+        # from coltype2func and coltype2align).
+        self._formatters = [Table.coltype2func[coltype]
+                            for coltype in self._coltypes]
+        self._col_align = [Table.coltype2align[coltype]
+                           for coltype in self._coltypes]
 
         self._rows = []
 
@@ -71,13 +77,23 @@ class Table():
         self._rows.append(row)
         return self
 
+    def add_rows(self, rows):
+        """Add new rows to the table.
+
+        Args:
+            rows: A list (rows) of list (columns) of cell entries.
+        """
+        assert max(map(len, rows), default=0) <= self._numcols
+        self._rows.extend(rows)
+        return self
+
     def set_rows(self, rows):
         """Replaces all rows of this table by rows.
 
         Args:
             rows: A list (rows) of list (columns) of cell entries.
         """
-        assert max(map(len, rows)) <= self._numcols
+        assert max(map(len, rows), default=0) <= self._numcols
         self._rows = rows
 
     def headers(self):
@@ -92,7 +108,7 @@ class Table():
         dependent on the column types specified while constructing this
         object.
         """
-        return list(map(lambda x: Table.coltype2align[x], self._coltypes))
+        return self._col_align
 
     def list(self):
         """Returns the table as a list (row) of lists (raw columns).
@@ -107,17 +123,22 @@ class Table():
         This function converts the raw value of a cell to string based on its
         column type.
         """
-        ret_list = []
-        for row in self.list():
-            ret_row = []
-            for col_num in range(len(row)):
-                if row[col_num] is None:
-                    ret_row.append('')
-                else:
-                    ret_row.append(Table.coltype2func[self._coltypes[col_num]](
-                        row[col_num]))
-            ret_list.append(ret_row)
-        return ret_list
+        rows = self.list()
+        formatters = self._formatters
+        if self._numcols and all(len(row) == self._numcols for row in rows):
+            # All rows are complete, format the table column by column (so
+            # that each inner loop only calls a single formatter). 'str'
+            # columns are already strings and don't need a formatter call.
+            columns = [['' if value is None else value for value in column]
+                       if coltype == 'str' else
+                       ['' if value is None else format_func(value)
+                        for value in column]
+                       for coltype, format_func, column in zip(
+                           self._coltypes, formatters, zip(*rows))]
+            return list(map(list, zip(*columns)))
+        return [['' if value is None else format_func(value)
+                 for format_func, value in zip(formatters, row)]
+                for row in rows]
 
     def string(self, tablefmt='simple'):
         """Returns the table as a formatted string."""
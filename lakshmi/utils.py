@@ -1,11 +1,22 @@
 """Common utils for Lakshmi."""
 
+import functools
+import hashlib
+import json
 import re
-from datetime import datetime
+from datetime import date, datetime
 
 import yaml
 
+try:
+    # Use the libyaml based (C) parser and emitter when they are available.
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader  # noqa: F401
 
+
+@functools.lru_cache(maxsize=4096)
 def format_money(x):
     """Formats input (money) to a string.
 
@@ -14,9 +25,14 @@ def format_money(x):
     Args:
         x: Float (non-negative) representing dollars.
     """
-    return '${:,.2f}'.format(x)
+    if not x:
+        # Common case in sparse tables. This also formats -0.0 (which is the
+        # same cache key as 0.0) as '$0.00'.
+        return '$0.00'
+    return f'${x:,.2f}'
 
 
+@functools.lru_cache(maxsize=4096)
 def format_money_delta(x):
     """Formats input (money delta) into a string.
 
@@ -25,9 +41,17 @@ def format_money_delta(x):
     Args:
         x: Float (postive or negative) representating dollars.
     """
-    return '{}${:,.2f}'.format('-' if x < 0 else '+', abs(x))
+    if not x:
+        return '+$0.00'
+    return f'{"-" if x < 0 else "+"}${abs(x):,.2f}'
+
+
+# Matches the common case of a date in YYYY/MM/DD format (month and day can be
+# single digits).
+_DATE_RE = re.compile(r'([0-9]{4})/([0-9]{1,2})/([0-9]{1,2})')
 
 
+@functools.lru_cache(maxsize=4096)
 def validate_date(date_text):
     """Validates if the date is in the YYYY/MM/DD format.
 
@@ -38,23 +62,113 @@ def validate_date(date_text):
         date_text: Date text to be validated.
 
     Returns:
-        Correctly formatted string representing date_text date.
+        Correctly formatted string representing date_text date. The results
+        are cached, as the same dates are usually validated repeatedly.
 
     Throws:
         ValueError if date is not in YYYY/MM/DD format.
     """
-    return datetime.strptime(date_text, '%Y/%m/%d').strftime('%Y/%m/%d')
+    match = _DATE_RE.fullmatch(date_text)
+    if not match:
+        # Let strptime handle (and report errors for) everything else.
+        return datetime.strptime(date_text, '%Y/%m/%d').strftime('%Y/%m/%d')
+    # date() throws ValueError for invalid dates (e.g. 2021/02/30).
+    d = date(*map(int, match.groups()))
+    return f'{d.year}/{d.month:02d}/{d.day:02d}'
+
+
+# Suffix of the file used to cache a JSON copy of a saved YAML file.
+_CACHE_SUFFIX = '.json.cache'
+
+
+def save_yaml(d, filename):
+    """Saves d to filename in YAML format.
+
+    In addition to filename, a JSON copy of d is saved to
+    filename + '.json.cache' along with a hash of the YAML text (unless d
+    can't be represented exactly in JSON). This copy is used by load_yaml to
+    skip parsing the (slower to parse) YAML file, as long as the YAML file is
+    not modified.
+
+    Args:
+        d: The object (usually a dict) to save.
+        filename: The file to save d to.
+    """
+    text = yaml.dump(d, Dumper=SafeDumper, sort_keys=False)
+    with open(filename, 'w') as f:
+        f.write(text)
+    try:
+        cache = json.dumps({'Hash': _hash_text(text), 'Data': d})
+    except (TypeError, ValueError):
+        return
+    if json.loads(cache)['Data'] != d:
+        # JSON can't represent d exactly (e.g. it converts non-string keys
+        # like 2030 to strings), so load_yaml must parse the YAML file.
+        return
+    try:
+        with open(filename + _CACHE_SUFFIX, 'w') as f:
+            f.write(cache)
+    except OSError:
+        # The cache is only an optimization, it is OK if it can't be
+        # written.
+        pass
+
+
+def _hash_text(text):
+    """Returns the SHA-256 hex digest of text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _read_cache(filename, text):
+    """Returns the cached object for filename.
 
+    Args:
+        filename: The YAML file saved by save_yaml.
+        text: The current contents of filename.
 
+    Returns: The object saved by save_yaml or None if the cache doesn't
+    exist or filename was modified after the cache was written.
+    """
+    try:
+        with open(filename + _CACHE_SUFFIX) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('Hash') != _hash_text(text):
+        return None
+    return cached.get('Data')
+
+
+def load_yaml(filename):
+    """Returns the object saved in the YAML file filename.
+
+    The JSON copy written by save_yaml is used instead of parsing the YAML
+    file if the contents of the YAML file haven't changed since then.
+    """
+    with open(filename) as f:
+        text = f.read()
+    d = _read_cache(filename, text)
+    if d is None:
+        d = yaml.load(text, Loader=SafeLoader)
+    return d
+
+
+# Matches comma-separated float values (e.g. 1,000.50).
+_COMMA_FLOAT_RE = re.compile(r'^-?[\d,]+\.?\d+$')
+
+
+@functools.lru_cache(maxsize=None)
 def get_loader():
-    """Returns a SafeLoader that can parse comma-separated float values."""
+    """Returns a SafeLoader that can parse comma-separated float values.
+
+    The constructor and resolver are only registered on the first call, later
+    calls return the same loader.
+    """
     def parse_comma_float(loader, node):
         value = loader.construct_scalar(node)
         return float(value.replace(',', ''))
 
     loader = yaml.SafeLoader
     loader.add_constructor(u'comma_float', parse_comma_float)
-    loader.add_implicit_resolver(u'comma_float',
-                                 re.compile(r'^-?[\d,]+\.?\d+$'),
-                                 None)
+    loader.add_implicit_resolver(u'comma_float', _COMMA_FLOAT_RE, None)
     return loader
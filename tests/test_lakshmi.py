@@ -1,10 +1,12 @@
 """Tests for lakshmi module."""
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import patch
 
 import lakshmi.cache
 from lakshmi import Account, AssetClass, Portfolio
-from lakshmi.assets import ManualAsset, TaxLot, TickerAsset
+from lakshmi.assets import IBonds, ManualAsset, TaxLot, TickerAsset
 from lakshmi.table import Table
 
 
@@ -102,6 +104,50 @@ class LakshmiTest(unittest.TestCase):
         self.assertEqual('Bonds', ret_class.name)
         self.assertAlmostEqual(0.2, ratio)
 
+    def test_asset_class_revalidate_after_child_modified(self):
+        equity = AssetClass('Equity')
+        asset_class = (
+            AssetClass('All')
+            .add_subclass(0.8, equity)
+            .add_subclass(0.2, AssetClass('Bonds'))).validate()
+        self.assertEqual({'Equity', 'Bonds'}, asset_class.leaves())
+
+        equity.add_subclass(0.6, AssetClass('US')).add_subclass(
+            0.4, AssetClass('International'))
+        asset_class.validate()
+        self.assertEqual({'US', 'International', 'Bonds'},
+                         asset_class.leaves())
+
+        equity.add_subclass(0.1, AssetClass('Bonds'))
+        with self.assertRaisesRegex(AssertionError, 'Sum of sub-classes'):
+            asset_class.validate()
+
+    def test_asset_class_revalidate_after_rename(self):
+        equity = AssetClass('Equity')
+        asset_class = (
+            AssetClass('All')
+            .add_subclass(0.8, equity)
+            .add_subclass(0.2, AssetClass('Bonds'))).validate()
+        self.assertEqual({'Equity', 'Bonds'}, asset_class.leaves())
+
+        equity.name = 'Stocks'
+        asset_class.validate()
+        self.assertEqual({'Stocks', 'Bonds'}, asset_class.leaves())
+        ret_class, ratio = asset_class.find_asset_class('Stocks')
+        self.assertIs(equity, ret_class)
+        self.assertAlmostEqual(0.8, ratio)
+
+        asset_class.name = 'Root'
+        asset_class.validate()
+        self.assertIs(asset_class, asset_class.find_asset_class('Root')[0])
+
+    def test_asset_class_mixed_type_names(self):
+        asset_class = (
+            AssetClass('All')
+            .add_subclass(0.5, AssetClass(2030))
+            .add_subclass(0.5, AssetClass('Bonds'))).validate()
+        self.assertEqual({2030, 'Bonds'}, asset_class.leaves())
+
     def test_asset_class_dict(self):
         asset_class = (
             AssetClass('All')
@@ -129,6 +175,7 @@ class LakshmiTest(unittest.TestCase):
             .add_subclass(0.2, AssetClass('Bonds'))).validate()
 
         asset_class2 = asset_class.copy().validate()
+        self.assertEqual(asset_class.to_dict(), asset_class2.to_dict())
         asset_class2.name = 'Changed'
         self.assertEqual('All', asset_class.name)
 
@@ -166,6 +213,13 @@ class LakshmiTest(unittest.TestCase):
                 'Unknown or non-leaf asset class: Bad Equity'):
             portfolio.add_account(account)
 
+        account = Account('Roth IRA', 'Post-tax').add_asset(
+            ManualAsset('Test Asset', 100.0, {2030: 0.5, 'Bonds': 0.5}))
+        with self.assertRaisesRegex(
+                AssertionError,
+                'Unknown or non-leaf asset class: 2030, Bonds'):
+            portfolio.add_account(account)
+
     def test_get_set_assets_from_account(self):
         account = (Account('Roth IRA', 'Post-tax')
                    .add_asset(ManualAsset('Test 1', 100.0, {'All': 1.0}))
@@ -182,6 +236,34 @@ class LakshmiTest(unittest.TestCase):
         with self.assertRaises(KeyError):
             account.get_asset('Test 1')
 
+    def test_account_total(self):
+        account = Account('Roth IRA', 'Post-tax').add_asset(
+            ManualAsset('Test 1', 100.0, {'All': 1.0}))
+        self.assertAlmostEqual(100.0, account.total())
+
+        account.add_asset(ManualAsset('Test 2', 200.0, {'All': 1.0}))
+        self.assertAlmostEqual(300.0, account.total())
+        account.get_asset('Test 1').what_if(-50)
+        self.assertAlmostEqual(250.0, account.total())
+        self.assertAlmostEqual(300.0, account.total(include_whatifs=False))
+        account.add_cash(50)
+        self.assertAlmostEqual(300.0, account.total())
+        account.remove_asset('Test 2')
+        self.assertAlmostEqual(100.0, account.total())
+
+    @patch('lakshmi.assets.IBonds.value')
+    def test_account_total_after_value_change(self, mock_value):
+        mock_value.return_value = 100.0
+        account = Account('Roth IRA', 'Post-tax').add_asset(
+            IBonds({'All': 1.0}))
+        self.assertAlmostEqual(100.0, account.total())
+
+        # Value of an asset changes without modifying the account (e.g.
+        # a bond is added to it or its price is refreshed).
+        mock_value.return_value = 150.0
+        self.assertAlmostEqual(150.0, account.total())
+        self.assertIn('$150.00', account.string())
+
     def test_account_dict(self):
         account = Account('Roth IRA', 'Post-tax').add_asset(
             ManualAsset('Test Asset', 100.0, {'All': 1.0}))
@@ -246,6 +328,54 @@ class LakshmiTest(unittest.TestCase):
         portfolio = Portfolio.from_dict(portfolio.to_dict())
         self.assertEqual(1, len(portfolio.accounts()))
 
+    def test_portfolio_save_load(self):
+        portfolio = Portfolio(AssetClass('Equity')).add_account(
+            Account('401(k)', 'Pre-tax').add_asset(
+                ManualAsset('Test Asset', 100.0, {'Equity': 1.0})))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = str(Path(tmpdir) / 'portfolio.yaml')
+            portfolio.save(filename)
+            self.assertTrue(Path(filename + '.json.cache').exists())
+            self.assertEqual(portfolio.to_dict(),
+                             Portfolio.load(filename).to_dict())
+
+            # Modifying the YAML file should invalidate the cache.
+            text = Path(filename).read_text()
+            Path(filename).write_text(text.replace('401(k)', 'Roth IRA'))
+            self.assertEqual(
+                'Roth IRA',
+                list(Portfolio.load(filename).accounts())[0].name())
+
+            Path(filename + '.json.cache').unlink()
+            self.assertEqual(
+                'Roth IRA',
+                list(Portfolio.load(filename).accounts())[0].name())
+
+    def test_portfolio_save_load_numeric_names(self):
+        portfolio = Portfolio(
+            AssetClass('All')
+            .add_subclass(0.5, AssetClass(2030))
+            .add_subclass(0.5, AssetClass('Bonds')).validate()).add_account(
+            Account('401(k)', 'Pre-tax').add_asset(
+                ManualAsset('Target 2030', 100.0, {2030: 1.0})))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = str(Path(tmpdir) / 'portfolio.yaml')
+            portfolio.save(filename)
+            self.assertEqual(portfolio.to_dict(),
+                             Portfolio.load(filename).to_dict())
+            self.assertEqual(portfolio.to_dict(),
+                             Portfolio.load(filename).to_dict())
+
+    def test_portfolio_numeric_account_name(self):
+        portfolio = Portfolio(AssetClass('Equity')).add_account(
+            Account(529, 'Taxable').add_asset(
+                ManualAsset('Test Asset', 100.0, {'Equity': 1.0})))
+        portfolio = Portfolio.from_dict(portfolio.to_dict())
+        self.assertEqual([529], [account.name()
+                                 for account in portfolio.accounts()])
+        portfolio.remove_account(529)
+        self.assertEqual(0, len(portfolio.accounts()))
+
     def test_asset_what_if(self):
         asset = ManualAsset('Test Asset', 100.0, {'Equity': 1.0})
         self.assertAlmostEqual(100, asset.adjusted_value())
@@ -372,6 +502,40 @@ class LakshmiTest(unittest.TestCase):
              ['', 'Taxable', '20.0%', '$10.00']],
             portfolio.asset_location().str_list())
 
+    @patch('lakshmi.assets.IBonds.value')
+    def test_portfolio_after_value_change(self, mock_value):
+        mock_value.return_value = 20.0
+        portfolio = Portfolio(
+            AssetClass('All')
+            .add_subclass(0.5, AssetClass('Equity'))
+            .add_subclass(0.5, AssetClass('Bonds')).validate()).add_account(
+            Account('Account', 'Taxable')
+            .add_asset(ManualAsset('Equity Asset', 80.0, {'Equity': 1.0}))
+            .add_asset(IBonds({'Bonds': 1.0})))
+
+        self.assertAlmostEqual(100.0, portfolio.total_value())
+        self.assertListEqual(
+            [['Equity', '80.0%', '50.0%', '$80.00', '-$30.00'],
+             ['Bonds', '20.0%', '50.0%', '$20.00', '+$30.00']],
+            portfolio.asset_allocation(['Equity', 'Bonds']).str_list())
+
+        # Value of an asset changes without modifying the portfolio.
+        mock_value.return_value = 80.0
+        self.assertAlmostEqual(160.0, portfolio.total_value())
+        self.assertListEqual(
+            [['Equity', '50.0%', '50.0%', '$80.00', '+$0.00'],
+             ['Bonds', '50.0%', '50.0%', '$80.00', '+$0.00']],
+            portfolio.asset_allocation(['Equity', 'Bonds']).str_list())
+        self.assertListEqual(
+            [['All:'],
+             ['Equity', '50.0%', '50.0%', '$80.00'],
+             ['Bonds', '50.0%', '50.0%', '$80.00']],
+            portfolio.asset_allocation_tree().str_list())
+        self.assertListEqual(
+            [['Equity', 'Taxable', '100.0%', '$80.00'],
+             ['Bonds', 'Taxable', '100.0%', '$80.00']],
+            portfolio.asset_location().str_list())
+
     def test_flat_asset_allocation(self):
         portfolio = Portfolio(
             AssetClass('All')
@@ -388,6 +552,9 @@ class LakshmiTest(unittest.TestCase):
         with self.assertRaisesRegex(AssertionError,
                                     'AssetAllocation called with'):
             portfolio.asset_allocation(['Equity', 'Intl'])
+        with self.assertRaisesRegex(AssertionError,
+                                    'AssetAllocation called with'):
+            portfolio.asset_allocation(['US', 'US', 'Bonds'])
 
         self.assertListEqual(
             [['US', '60.0%', '48.0%', '$60.00', '-$12.00'],
@@ -430,6 +597,41 @@ class LakshmiTest(unittest.TestCase):
              ['Intl', '33.3%', '40.0%', '$30.00']],
             portfolio.asset_allocation_tree().str_list())
 
+    def test_asset_allocation_compact_deep_tree(self):
+        portfolio = Portfolio(
+            AssetClass('All')
+            .add_subclass(0.6,
+                          AssetClass('Equity')
+                          .add_subclass(0.5,
+                                        AssetClass('US')
+                                        .add_subclass(0.5, AssetClass('Big'))
+                                        .add_subclass(0.5, AssetClass('Sm')))
+                          .add_subclass(0.5, AssetClass('Intl')))
+            .add_subclass(0.4,
+                          AssetClass('Bonds')
+                          .add_subclass(0.5, AssetClass('Muni'))
+                          .add_subclass(0.5, AssetClass('Treasury')))
+        ).add_account(
+            Account('Account', 'Taxable')
+            .add_asset(ManualAsset('Big Asset', 30.0, {'Big': 1.0}))
+            .add_asset(ManualAsset('Sm Asset', 10.0, {'Sm': 1.0}))
+            .add_asset(ManualAsset('Intl Asset', 20.0, {'Intl': 1.0}))
+            .add_asset(ManualAsset('Muni Asset', 25.0, {'Muni': 1.0}))
+            .add_asset(ManualAsset('Tsy Asset', 15.0, {'Treasury': 1.0})))
+
+        self.assertListEqual(
+            [['Equity', '60%', '60%', 'US', '67%', '50%', 'Big', '75%',
+              '50%', '30.0%', '15.0%', '$30.00', '-$15.00'],
+             ['', '', '', '', '', '', 'Sm', '25%', '50%', '10.0%',
+              '15.0%', '$10.00', '+$5.00'],
+             ['', '', '', 'Intl', '33%', '50%', '', '', '', '20.0%', '30.0%',
+              '$20.00', '+$10.00'],
+             ['Bonds', '40%', '40%', 'Muni', '62%', '50%', '', '', '',
+              '25.0%', '20.0%', '$25.00', '-$5.00'],
+             ['', '', '', 'Treasury', '38%', '50%', '', '', '', '15.0%',
+              '20.0%', '$15.00', '+$5.00']],
+            portfolio.asset_allocation_compact().str_list())
+
     def test_multiple_accounts_and_assets(self):
         portfolio = Portfolio(AssetClass('All'))
         asset_class_map = {'All': 1.0}
@@ -488,6 +690,14 @@ class LakshmiTest(unittest.TestCase):
             portfolio.get_account_name_by_substr('Acc')
         with self.assertRaisesRegex(AssertionError, 'does not match'):
             portfolio.get_account_name_by_substr('God')
+        with self.assertRaisesRegex(AssertionError, 'matches more than'):
+            portfolio.get_account_name_by_substr('ccount')
+        portfolio.remove_account('Account 1')
+        self.assertEqual(
+            'Account 2',
+            portfolio.get_account_name_by_substr('ccount'))
+        with self.assertRaisesRegex(AssertionError, 'does not match'):
+            portfolio.get_account_name_by_substr('Account 1')
 
     def test_get_asset_name_by_substr(self):
         portfolio = Portfolio(AssetClass('All'))
@@ -667,6 +877,57 @@ class LakshmiTest(unittest.TestCase):
             [['Account', 'Asset', '+$50.00']],
             asset_whatifs.str_list())
 
+    def test_asset_allocation_after_changes(self):
+        portfolio = Portfolio(
+            AssetClass('All')
+            .add_subclass(0.5, AssetClass('Bonds'))
+            .add_subclass(0.5, AssetClass('Stocks')))
+        account = Account('Account', 'Taxable')
+        account.add_asset(ManualAsset('Asset', 100.0, {'Bonds': 1.0}))
+        portfolio.add_account(account)
+        self.assertListEqual(
+            [['Bonds', '100.0%', '50.0%', '$100.00', '-$50.00'],
+             ['Stocks', '0.0%', '50.0%', '$0.00', '+$50.00']],
+            portfolio.asset_allocation(['Bonds', 'Stocks']).str_list())
+
+        portfolio.what_if('Account', 'Asset', -50)
+        self.assertListEqual(
+            [['Bonds', '100.0%', '50.0%', '$50.00', '-$25.00'],
+             ['Stocks', '0.0%', '50.0%', '$0.00', '+$25.00']],
+            portfolio.asset_allocation(['Bonds', 'Stocks']).str_list())
+
+        portfolio.reset_what_ifs()
+        account.get_asset('Asset').what_if(50)
+        self.assertListEqual(
+            [['Bonds', '100.0%', '50.0%', '$150.00', '-$75.00'],
+             ['Stocks', '0.0%', '50.0%', '$0.00', '+$75.00']],
+            portfolio.asset_allocation(['Bonds', 'Stocks']).str_list())
+
+        portfolio.reset_what_ifs()
+        account.add_asset(ManualAsset('Stock', 100.0, {'Stocks': 1.0}))
+        self.assertListEqual(
+            [['Bonds', '50.0%', '50.0%', '$100.00', '+$0.00'],
+             ['Stocks', '50.0%', '50.0%', '$100.00', '+$0.00']],
+            portfolio.asset_allocation(['Bonds', 'Stocks']).str_list())
+
+    def test_replace_asset_classes(self):
+        portfolio = Portfolio(
+            AssetClass('All')
+            .add_subclass(0.5, AssetClass('Bonds'))
+            .add_subclass(0.5, AssetClass('Stocks')))
+        portfolio.add_account(
+            Account('Account', 'Taxable').add_asset(
+                ManualAsset('Asset', 100.0, {'Bonds': 1.0})))
+
+        portfolio.asset_classes = (
+            AssetClass('All')
+            .add_subclass(0.2, AssetClass('Bonds'))
+            .add_subclass(0.8, AssetClass('Cash')))
+        self.assertListEqual(
+            [['Bonds', '100.0%', '20.0%', '$100.00', '-$80.00'],
+             ['Cash', '0.0%', '80.0%', '$0.00', '+$80.00']],
+            portfolio.asset_allocation(['Bonds', 'Cash']).str_list())
+
     def test_return_allocation_one_asset(self):
         asset_class = AssetClass('All').validate()
         allocation = {'All': 10.0}
@@ -1,7 +1,12 @@
 """Test for lakshmi.performance module."""
 
+import os
+import tempfile
 import unittest
-from datetime import datetime
+from datetime import date, timedelta
+from pathlib import Path
+
+from pyxirr import xirr
 
 from lakshmi.performance import Checkpoint, Performance, Timeline
 
@@ -20,6 +25,7 @@ class PerformanceTest(unittest.TestCase):
         c = Checkpoint('2020/1/1', 200, inflow=100, outflow=50)
         self.assertEqual(200, c.get_portfolio_value())
         self.assertEqual('2020/01/01', c.get_date())
+        self.assertEqual(date(2020, 1, 1), c.get_date_obj())
         self.assertEqual(100, c.get_inflow())
         self.assertEqual(50, c.get_outflow())
 
@@ -111,6 +117,23 @@ class PerformanceTest(unittest.TestCase):
         self.assertEqual(150, timeline.get_checkpoint('2021/01/16', True)
                          .get_portfolio_value())
 
+    def test_timeline_insert_delete(self):
+        timeline = Timeline([
+            Checkpoint('2021/1/1', 100),
+            Checkpoint('2021/3/1', 500)])
+        timeline.insert_checkpoint(Checkpoint('2021/2/1', 300))
+        timeline.insert_checkpoint(Checkpoint('2021/4/1', 600))
+        self.assertEqual(
+            ['2021/01/01', '2021/02/01', '2021/03/01', '2021/04/01'],
+            [cp['Date'] for cp in timeline.to_list()])
+
+        timeline.delete_checkpoint('2021/2/1')
+        timeline.delete_checkpoint('2021/4/1')
+        self.assertEqual(['2021/01/01', '2021/03/01'],
+                         [cp['Date'] for cp in timeline.to_list()])
+        with self.assertRaises(AssertionError):
+            timeline.delete_checkpoint('2021/2/1')
+
     def test_timeline_to_list(self):
         checkpoints = [
             Checkpoint('2021/1/1', 100),
@@ -160,24 +183,67 @@ class PerformanceTest(unittest.TestCase):
         timeline = Timeline(checkpoints)
         data = timeline.get_performance_data('2021/01/01', '2021/03/01')
         self.assertEqual(
-            [datetime(2021, 1, 1), datetime(2021, 1, 31),
-             datetime(2021, 3, 1)],
-            data.dates)
-        self.assertEqual([-100, -100, 510], data.amounts)
+            [date(2021, 1, 1), date(2021, 1, 31),
+             date(2021, 3, 1)],
+            data.dates.tolist())
+        self.assertEqual([-100, -100, 510], data.amounts.tolist())
         self.assertEqual(100, data.begin_balance)
         self.assertEqual(500, data.end_balance)
         self.assertEqual(160, data.inflows)
         self.assertEqual(70, data.outflows)
+        self.assertAlmostEqual(
+            xirr(data.dates.tolist(), data.amounts.tolist()), data.irr)
 
         data = timeline.get_performance_data('2021/01/16', '2021/01/31')
-        self.assertEqual([datetime(2021, 1, 16), datetime(2021, 1, 31)],
-                         data.dates)
-        self.assertEqual([-150, 200], data.amounts)
+        self.assertEqual([date(2021, 1, 16), date(2021, 1, 31)],
+                         data.dates.tolist())
+        self.assertEqual([-150, 200], data.amounts.tolist())
         self.assertEqual(150, data.begin_balance)
         self.assertEqual(300, data.end_balance)
         self.assertEqual(150, data.inflows)
         self.assertEqual(50, data.outflows)
 
+        # Begin after end: there are no cashflows in between.
+        data = timeline.get_performance_data('2021/02/15', '2021/01/15')
+        self.assertEqual([date(2021, 2, 15), date(2021, 1, 15)],
+                         data.dates.tolist())
+        self.assertEqual(0, data.inflows)
+        self.assertEqual(0, data.outflows)
+
+    def test_get_performance_data_after_changes(self):
+        timeline = Timeline([
+            Checkpoint('2021/1/1', 100),
+            Checkpoint('2021/3/1', 500, inflow=10, outflow=20)])
+        data = timeline.get_performance_data('2021/1/1', '2021/3/1')
+        self.assertIs(data, timeline.get_performance_data(None, None))
+        self.assertEqual(10, data.inflows)
+
+        timeline.insert_checkpoint(
+            Checkpoint('2021/1/31', 300, inflow=150, outflow=50))
+        data = timeline.get_performance_data('2021/01/01', '2021/03/01')
+        self.assertEqual(160, data.inflows)
+        self.assertEqual(70, data.outflows)
+
+        timeline.delete_checkpoint('2021/1/31')
+        data = timeline.get_performance_data('2021/01/01', '2021/03/01')
+        self.assertEqual(10, data.inflows)
+        self.assertEqual(20, data.outflows)
+
+    def test_get_performance_data_cache_bounded(self):
+        timeline = Timeline([
+            Checkpoint('2021/1/1', 100),
+            Checkpoint('2021/3/1', 500, inflow=10, outflow=20)])
+        data = timeline.get_performance_data('2021/1/1', '2021/3/1')
+        for day in range(2, 60):
+            timeline.get_performance_data(
+                '2021/1/1', (date(2021, 1, 1) + timedelta(days=day))
+                .strftime('%Y/%m/%d'))
+            # Keep the first entry recently used.
+            self.assertIs(
+                data, timeline.get_performance_data('2021/1/1', '2021/3/1'))
+        self.assertEqual(Timeline._PERFORMANCE_DATA_CACHE_SIZE,
+                         len(timeline._performance_data))
+
     def test_get_performance_data_none_dates(self):
         checkpoints = [
             Checkpoint('2021/1/1', 100),
@@ -194,6 +260,28 @@ class PerformanceTest(unittest.TestCase):
         self.assertEqual('2021/01/01', perf.get_timeline().begin())
         self.assertEqual('2021/01/01', perf.get_timeline().end())
 
+    def test_performance_save_load(self):
+        perf = Performance(Timeline([
+            Checkpoint('2021/1/1', 100),
+            Checkpoint('2021/3/1', 500, inflow=10, outflow=20)]))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = str(Path(tmpdir) / 'performance.yaml')
+            perf.save(filename)
+            self.assertTrue(Path(filename + '.json.cache').exists())
+            self.assertEqual(perf.to_dict(),
+                             Performance.load(filename).to_dict())
+
+            # Modifying the YAML file should invalidate the cache, even if
+            # its size and modification time are unchanged.
+            stat = os.stat(filename)
+            text = Path(filename).read_text()
+            Path(filename).write_text(text.replace('500', '600'))
+            os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            self.assertEqual(
+                600,
+                Performance.load(filename).get_timeline().get_checkpoint(
+                    '2021/3/1').get_portfolio_value())
+
     def test_summary_table_single_date(self):
         perf_table = Performance(Timeline([
             Checkpoint('2021/1/1', 100)])).summary_table()
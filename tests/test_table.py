@@ -30,6 +30,17 @@ class TableTest(unittest.TestCase):
         t = Table(3)
         t.set_rows([['1', '2']])
         self.assertListEqual([['1', '2']], t.str_list())
+        t.set_rows([])
+        self.assertListEqual([], t.str_list())
+
+    def test_add_rows(self):
+        t = Table(3)
+        t.add_row(['1', '2', '3'])
+        t.add_rows([['4', '5'], ['6']])
+        self.assertListEqual([['1', '2', '3'], ['4', '5'], ['6']],
+                             t.str_list())
+        with self.assertRaises(AssertionError):
+            t.add_rows([['1', '2', '3', '4']])
 
     def test_headers_and_diff_coltypes(self):
         headers = ['1', '2', '3', '4', '5', '6']
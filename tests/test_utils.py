@@ -28,6 +28,12 @@ class UtilsTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             utils.validate_date('2021/02/29')  # 2021 is not leap year.
 
+        with self.assertRaises(ValueError):
+            utils.validate_date('2021/13/01')
+
+        with self.assertRaises(ValueError):
+            utils.validate_date('2021-01-01')
+
     def test_resolver(self):
         data = 'a: 100.22\nb: 122,121,000.22\nc: -121,122.12\nd: 1,000'
         loaded = yaml.load(data, Loader=utils.get_loader())